@@ -11,34 +11,79 @@ __all__ = [
     "create_category_id", "add_category", "create_category_combinations", "verify_config_processes",
 ]
 
-import re
 import itertools
-from typing import Callable, Any
+import collections
+import functools
+import hashlib
+import sys
+from typing import Callable, Iterator, Any
 
 import law
 import order as od
 
 
+logger = law.logger.get_logger(__name__)
+
+
 def get_root_processes_from_campaign(campaign: od.Campaign) -> od.UniqueObjectIndex:
     """
     Extracts all root process objects from datasets contained in an order campaign and returns them
-    in a unique object index.
+    in a unique object index, together with all their subprocesses. The order of root processes in
+    the index is not defined. A campaign without datasets results in an empty index.
     """
     # get all dataset processes
-    processes = set.union(*map(set, (dataset.processes for dataset in campaign.datasets)))
+    processes = set(itertools.chain.from_iterable(
+        dataset.processes for dataset in campaign.datasets
+    ))
 
     # get their root processes
-    root_processes = set.union(*map(set, (process.get_root_processes() for process in processes)))
+    root_processes = set(itertools.chain.from_iterable(
+        process.get_root_processes() for process in processes
+    ))
 
-    # create an empty index and fill subprocesses via walking
+    # create an empty index and fill subprocesses via breadth-first walking
+    # (processes shared between multiple root processes are only visited and added once)
     index = od.UniqueObjectIndex(cls=od.Process)
+    seen_ids = set()
     for root_process in root_processes:
-        for process, _, _ in root_process.walk_processes(include_self=True):
+        queue = collections.deque([root_process])
+        while queue:
+            process = queue.popleft()
+            if id(process) in seen_ids:
+                continue
+            seen_ids.add(id(process))
             index.add(process, overwrite=True)
+            queue.extend(process.processes)
 
     return index
 
 
+def _prefix_template_fields(s: str) -> str:
+    """
+    Prefixes all template fields in a string *s* that do not already start with an underscore with
+    one, e.g. ``"{name}_{_id}"`` becomes ``"{_name}_{_id}"``.
+    """
+    if "{" not in s:
+        return s
+
+    parts = []
+    i = 0
+    n = len(s)
+    while True:
+        j = s.find("{", i)
+        if j < 0 or j + 1 >= n:
+            parts.append(s[i:])
+            break
+        parts.append(s[i:j + 1])
+        if s[j + 1] != "_":
+            parts.append("_")
+        # the character following the brace is consumed as well
+        parts.append(s[j + 1])
+        i = j + 2
+
+    return "".join(parts)
+
+
 def add_shift_aliases(
     config: od.Config,
     shift_source: str,
@@ -64,7 +109,8 @@ def add_shift_aliases(
         shift = config.get_shift(od.Shift.join_name(shift_source, direction))
         _aliases = shift.x("column_aliases", {})
         # format keys and values
-        inject_shift = lambda s: re.sub(r"\{([^_])", r"{_\1", s).format(**shift.__dict__)
+        fmt_kwargs = shift.__dict__
+        inject_shift = lambda s: _prefix_template_fields(s).format_map(fmt_kwargs)
         _aliases.update({inject_shift(key): inject_shift(value) for key, value in aliases.items()})
         # extend existing or register new column aliases
         shift.x.column_aliases = _aliases
@@ -75,13 +121,10 @@ def get_shifts_from_sources(config: od.Config, *shift_sources: str) -> list[od.S
     Takes a *config* object and returns a list of shift instances for both directions given a
     sequence *shift_sources*.
     """
-    return sum(
-        (
-            [config.get_shift(f"{s}_up"), config.get_shift(f"{s}_down")]
-            for s in shift_sources
-        ),
-        [],
-    )
+    return list(itertools.chain.from_iterable(
+        (config.get_shift(f"{s}_up"), config.get_shift(f"{s}_down"))
+        for s in shift_sources
+    ))
 
 
 def create_category_id(
@@ -92,26 +135,44 @@ def create_category_id(
 ) -> int:
     """
     Creates a unique id for a :py:class:`order.Category` named *category_name* in a
-    :py:class:`order.Config` object *config* and returns it. Internally,
-    :py:func:`law.util.create_hash` is used which receives *hash_len*. In case of an unintentional
-    (yet unlikely) collision of two ids, there is the option to add a custom *salt* value.
+    :py:class:`order.Config` object *config* and returns it. Internally, the same hashing as in
+    :py:func:`law.util.create_hash` is used with a length of *hash_len*. In case of an
+    unintentional (yet unlikely) collision of two ids, there is the option to add a custom *salt*
+    value.
 
     .. note::
 
         Please note that the size of the returned id depends on *hash_len*. When storing the id
         subsequently in an array, please be aware that values 8 or more require a ``np.int64``.
     """
-    # create the hash
-    h = law.util.create_hash((config.name, config.id, category_name, salt), l=hash_len)
-    h = int(h, base=16)
+    # the cache is keyed by the exact input of the hash
+    inp = str((config.name, config.id, category_name, salt))
+    return _create_category_id_cached(inp, hash_len)
+
+
+@functools.lru_cache(maxsize=2 ** 16)
+def _create_category_id_cached(inp: str, hash_len: int) -> int:
+    # create the hash, using hashlib directly but identical to law.util.create_hash
+    h = int(hashlib.sha256(inp.encode("latin-1")).hexdigest()[:hash_len], base=16)
 
     # add an offset to ensure that are hashes are above a threshold
-    digits = len(str(int("F" * hash_len, base=16)))
-    h += int(10 ** digits)
+    h += _get_category_id_offset(hash_len)
 
     return h
 
 
+# cache of id offsets per hash length
+_category_id_offsets: dict[int, int] = {}
+
+
+def _get_category_id_offset(hash_len: int) -> int:
+    offset = _category_id_offsets.get(hash_len)
+    if offset is None:
+        digits = len(str(int("F" * hash_len, base=16)))
+        offset = _category_id_offsets[hash_len] = int(10 ** digits)
+    return offset
+
+
 def add_category(config: od.Config, **kwargs) -> od.Category:
     """
     Creates a :py:class:`order.Category` instance by forwarding all *kwargs* to its constructor,
@@ -128,12 +189,18 @@ def add_category(config: od.Config, **kwargs) -> od.Category:
     return config.add_category(**kwargs)
 
 
+def _intern(s: str) -> str:
+    # sys.intern only accepts exact str instances, so subclasses are returned unchanged
+    return sys.intern(s) if type(s) is str else s
+
+
 def create_category_combinations(
     config: od.Config,
     categories: dict[str, list[od.Categories]],
     name_fn: Callable[[Any], str],
     kwargs_fn: Callable[[Any], dict] | None = None,
     skip_existing: bool = True,
+    max_combinations: int | None = 10 ** 7,
 ) -> int:
     """
     Given a *config* object and sequences of *categories* in a dict, creates all combinations of
@@ -154,6 +221,9 @@ def create_category_combinations(
     If the name of a new category is already known to *config* it is skipped unless *skip_existing*
     is *False*.
 
+    As the number of combinations grows quickly with the number of groups and categories, a warning
+    is issued when it exceeds *max_combinations*, which can be set to *None* to disable the check.
+
     Example:
 
     .. code-block:: python
@@ -179,7 +249,8 @@ def create_category_combinations(
     """
     n_created_categories = 0
     n_groups = len(categories)
-    group_names = list(categories.keys())
+    # names are interned as they are used heavily as dict and set keys below
+    group_names = [_intern(group_name) for group_name in categories.keys()]
 
     # nothing to do when there are less than 2 groups
     if n_groups < 2:
@@ -191,48 +262,119 @@ def create_category_combinations(
     if kwargs_fn and not callable(kwargs_fn):
         raise TypeError(f"when set, kwargs_fn must be a function, but got {kwargs_fn}")
 
+    # count all combinations at all depths, i.e., all products of two or more groups
+    if max_combinations is not None:
+        n_combinations = 1
+        for cats in categories.values():
+            n_combinations *= len(cats) + 1
+        n_combinations -= 1 + sum(len(cats) for cats in categories.values())
+        if n_combinations > max_combinations:
+            logger.warning(
+                f"creating {n_combinations} category combinations from {n_groups} groups exceeds "
+                f"the maximum of {max_combinations}, which might take long and require large "
+                "amounts of memory",
+            )
+
+    # cache names and objects of all existing categories to avoid repeated deep lookups
+    seen_names: set[str] = set()
+    parent_cache: dict[str, od.Category] = {}
+    for cat, _, _ in config.walk_categories():
+        seen_names.add(cat.name)
+        parent_cache[cat.name] = cat
+
+    # names of categories per group, looked up by index when building combinations
+    category_names = {
+        group_name: [_intern(cat.name) for cat in categories[group_name]]
+        for group_name in group_names
+    }
+
+    # memoize name_fn results, keyed by the frozen group -> category name mapping, while name_fn
+    # itself always receives the mapping in group order
+    name_cache: dict[frozenset[tuple[str, str]], str] = {}
+
+    def cached_name(key: frozenset[tuple[str, str]], names: dict[str, str]) -> str:
+        name = name_cache.get(key)
+        if name is None:
+            name = _intern(name_fn(**names))
+            name_cache[key] = name
+        return name
+
+    # categories created in this call, keyed the same way
+    created: dict[frozenset[tuple[str, str]], od.Category] = {}
+
+    def combine_groups(
+        combinations: list[tuple[int, ...]],
+    ) -> Iterator[tuple[tuple[str, ...], list[tuple[str, ...]]]]:
+        # extend each combination of group indices by one group with a higher index, yield the new
+        # group names together with those of their direct parents (one group less) and recurse, so
+        # that combinations are generated in depth-ascending order and parents always exist
+        next_combinations = [
+            combination + (i,)
+            for combination in combinations
+            for i in range(combination[-1] + 1, n_groups)
+        ]
+        if not next_combinations:
+            return
+        for combination in next_combinations:
+            _group_names = tuple(group_names[i] for i in combination)
+            _parent_group_names = [
+                _group_names[:i] + _group_names[i + 1:]
+                for i in reversed(range(len(_group_names)))
+            ]
+            yield _group_names, _parent_group_names
+        yield from combine_groups(next_combinations)
+
     # start combining, considering one additional groups for combinatorics at a time
-    for _n_groups in range(2, n_groups + 1):
-
-        # build all group combinations
-        for _group_names in itertools.combinations(group_names, _n_groups):
-
-            # build the product of all categories for the given groups
-            _categories = [categories[group_name] for group_name in _group_names]
-            for root_cats in itertools.product(*_categories):
-                # build the name
-                root_cats = dict(zip(_group_names, root_cats))
-                cat_name = name_fn(**{
-                    group_name: cat.name
-                    for group_name, cat in root_cats.items()
-                })
-
-                # skip when already existing
-                if skip_existing and config.has_category(cat_name, deep=True):
-                    continue
-
-                # create arguments for the new category
-                kwargs = kwargs_fn(root_cats) if callable(kwargs_fn) else {}
-                if "id" not in kwargs:
-                    kwargs["id"] = create_category_id(config, cat_name)
-                if "selection" not in kwargs:
-                    kwargs["selection"] = [c.selection for c in root_cats.values()]
-
-                # create the new category
-                cat = od.Category(name=cat_name, **kwargs)
-                n_created_categories += 1
-
-                # find direct parents and connect them
-                for _parent_group_names in itertools.combinations(_group_names, _n_groups - 1):
+    for _group_names, _parent_group_names_list in combine_groups([(i,) for i in range(n_groups)]):
+
+        # build the product of all categories for the given groups, walking through indices so that
+        # category tuples are only materialized for combinations that are not skipped
+        _categories = [categories[group_name] for group_name in _group_names]
+        _category_names = [category_names[group_name] for group_name in _group_names]
+        for indices in itertools.product(*(range(len(cats)) for cats in _categories)):
+            # build the name
+            root_cat_names = {
+                group_name: names[i]
+                for group_name, names, i in zip(_group_names, _category_names, indices)
+            }
+            cat_key = frozenset(root_cat_names.items())
+            cat_name = cached_name(cat_key, root_cat_names)
+
+            # skip when already existing, before doing any further work
+            if skip_existing and cat_name in seen_names:
+                continue
+            _root_cats = tuple(cats[i] for cats, i in zip(_categories, indices))
+
+            # create arguments for the new category, only building the category dict when needed
+            kwargs = kwargs_fn(dict(zip(_group_names, _root_cats))) if kwargs_fn else {}
+            if "id" not in kwargs:
+                kwargs["id"] = create_category_id(config, cat_name)
+            if "selection" not in kwargs:
+                kwargs["selection"] = [c.selection for c in _root_cats]
+
+            # create the new category
+            cat = od.Category(name=cat_name, **kwargs)
+            n_created_categories += 1
+            seen_names.add(cat_name)
+            parent_cache[cat_name] = cat
+            created[cat_key] = cat
+
+            # find direct parents and connect them, preferring categories created in this call and
+            # falling back to existing ones otherwise
+            for _parent_group_names in _parent_group_names_list:
+                parent_cat_names = {
+                    group_name: root_cat_names[group_name]
+                    for group_name in _parent_group_names
+                }
+                parent_key = frozenset(parent_cat_names.items())
+                parent_cat = created.get(parent_key)
+                if parent_cat is None:
                     if len(_parent_group_names) == 1:
-                        parent_cat_name = root_cats[_parent_group_names[0]].name
+                        parent_cat_name = root_cat_names[_parent_group_names[0]]
                     else:
-                        parent_cat_name = name_fn(**{
-                            group_name: root_cats[group_name].name
-                            for group_name in _parent_group_names
-                        })
-                    parent_cat = config.get_category(parent_cat_name, deep=True)
-                    parent_cat.add_category(cat)
+                        parent_cat_name = cached_name(parent_key, parent_cat_names)
+                    parent_cat = parent_cache[parent_cat_name]
+                parent_cat.add_category(cat)
 
     return n_created_categories
 
@@ -243,10 +385,14 @@ def verify_config_processes(config: od.Config, warn: bool = False) -> None:
     by any process object registered in *config* and raises an exception if not. If *warn* is
     *True*, a warning is printed instead.
     """
+    # names of all processes known to the config, used for fast lookups before falling back to the
+    # full (deep) check, e.g. for processes that are still to be created lazily
+    known_names = {process.name for process, _, _ in config.walk_processes()}
+
     missing_pairs = []
     for dataset in config.datasets:
         for process in dataset.processes:
-            if not config.has_process(process):
+            if process.name not in known_names and not config.has_process(process):
                 missing_pairs.append((dataset, process))
 
     # nothing to do when nothing is missing
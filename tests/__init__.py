@@ -17,4 +17,5 @@ import columnflow as cf  # noqa
 
 # import all tests
 from .test_util import *
+from .test_config_util import *
 from .test_columnar_util import *
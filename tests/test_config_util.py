@@ -0,0 +1,314 @@
+# coding: utf-8
+
+
+__all__ = [
+    "RootProcessesTest", "VerifyConfigProcessesTest", "ShiftAliasesTest", "CreateCategoryIdTest",
+    "CreateCategoryCombinationsTest",
+]
+
+
+import io
+import unittest
+import contextlib
+
+import order as od
+
+from columnflow.config_util import (
+    get_root_processes_from_campaign, _prefix_template_fields, add_shift_aliases, create_category_id,
+    create_category_combinations, verify_config_processes,
+)
+
+
+def create_config() -> od.Config:
+    campaign = od.Campaign("test_campaign", 1)
+    return od.Config(name="test_config", id=1, campaign=campaign)
+
+
+class RootProcessesTest(unittest.TestCase):
+
+    def test_shared_processes(self):
+        campaign = od.Campaign("test_campaign", 1)
+
+        # "shared" is a subprocess of both root processes
+        tt = od.Process("tt", 1)
+        tt_sl = tt.add_process("tt_sl", 2)
+        tt.add_process("tt_dl", 3)
+        st = od.Process("st", 10)
+        shared = od.Process("shared", 20)
+        tt.add_process(shared)
+        st.add_process(shared)
+
+        # datasets with leaf processes
+        campaign.add_dataset("tt_sl", 1, processes=[tt_sl])
+        campaign.add_dataset("shared", 2, processes=[shared])
+
+        index = get_root_processes_from_campaign(campaign)
+        self.assertEqual(len(index), 5)
+        self.assertEqual({p.name for p in index}, {"tt", "tt_sl", "tt_dl", "st", "shared"})
+        self.assertIs(index.get("shared"), shared)
+
+    def test_no_datasets(self):
+        index = get_root_processes_from_campaign(od.Campaign("test_campaign", 1))
+        self.assertEqual(len(index), 0)
+
+
+class VerifyConfigProcessesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = create_config()
+
+        # "tt_sl" is only registered as a deep subprocess
+        tt = self.config.add_process("tt", 1)
+        tt_sl = tt.add_process("tt_sl", 2)
+        self.config.add_dataset(self.config.campaign.add_dataset("tt_sl", 1, processes=[tt_sl]))
+
+    def add_missing(self):
+        dy = od.Process("dy", 3)
+        self.config.add_dataset(self.config.campaign.add_dataset("dy", 2, processes=[dy]))
+
+    def test_deep_process(self):
+        verify_config_processes(self.config)
+
+    def test_missing_process(self):
+        self.add_missing()
+
+        with self.assertRaises(Exception) as cm:
+            verify_config_processes(self.config)
+        self.assertIn("found 1 dataset(s)", str(cm.exception))
+        self.assertIn("dataset 'dy' -> process 'dy'", str(cm.exception))
+
+    def test_missing_process_warn(self):
+        self.add_missing()
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            verify_config_processes(self.config, warn=True)
+        self.assertIn("dataset 'dy' -> process 'dy'", out.getvalue())
+        self.assertNotIn("tt_sl", out.getvalue())
+
+
+class ShiftAliasesTest(unittest.TestCase):
+
+    def test_prefix_template_fields(self):
+        # expectations identical to re.sub(r"\{([^_])", r"{_\1", s)
+        table = [
+            ("{name}_{_id}", "{_name}_{_id}"),
+            ("{_name}{id}", "{_name}{_id}"),
+            ("{{", "{_{"),
+            ("weight_{", "weight_{"),
+            ("{\nname}", "{_\nname}"),
+            ("no_braces", "no_braces"),
+            ("", ""),
+        ]
+        for s, expected in table:
+            self.assertEqual(_prefix_template_fields(s), expected)
+
+    def test_add_shift_aliases(self):
+        config = create_config()
+        config.add_shift(name="pdf_up", id=2)
+        config.add_shift(name="pdf_down", id=3)
+        config.get_shift("pdf_up").x.column_aliases = {"existing": "existing_up"}
+
+        add_shift_aliases(config, "pdf", {"pdf_weight_{_direction}": "pdf_{name}_{id}"})
+
+        self.assertEqual(config.get_shift("pdf_up").x.column_aliases, {
+            "existing": "existing_up",
+            "pdf_weight_up": "pdf_pdf_up_2",
+        })
+        self.assertEqual(config.get_shift("pdf_down").x.column_aliases, {
+            "pdf_weight_down": "pdf_pdf_down_3",
+        })
+
+
+class CreateCategoryIdTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = create_config()
+
+    def test_fixed_ids(self):
+        self.assertEqual(create_category_id(self.config, "e"), 1068612023)
+        self.assertEqual(create_category_id(self.config, "e__1j"), 1224313071)
+        self.assertEqual(create_category_id(self.config, "e", hash_len=4), 116750)
+
+    def test_salt(self):
+        # salts that compare equal but have different types must result in different ids
+        ids = [create_category_id(self.config, "e", salt=salt) for salt in (1, True, 1.0)]
+        self.assertEqual(ids, [1231642694, 1127815019, 1151871142])
+
+        # same for nested salts, independent of the call order
+        salts = [(1,), (True,), frozenset({1}), frozenset({True})]
+        expected = [1222995162, 1169350824, 1192644800, 1049084348]
+        for _salts, _expected in [(salts, expected), (salts[::-1], expected[::-1])]:
+            ids = [create_category_id(self.config, "e", salt=salt) for salt in _salts]
+            self.assertEqual(ids, _expected)
+
+        # unhashable salts are supported as well
+        self.assertEqual(create_category_id(self.config, "e", salt=[1]), 1128536292)
+
+
+class CreateCategoryCombinationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = create_config()
+
+        self.categories = {}
+        cat_id = 1
+        for group_name, cat_names in [
+            ("lep", ["e", "mu"]),
+            ("jet", ["1j", "2j"]),
+            ("tag", ["0b"]),
+            ("reg", ["sr"]),
+        ]:
+            self.categories[group_name] = []
+            for cat_name in cat_names:
+                cat = self.config.add_category(name=cat_name, id=cat_id, selection=f"sel_{cat_name}")
+                self.categories[group_name].append(cat)
+                cat_id += 1
+
+        # name_fn that relies on the order of keyword arguments
+        self.name_fn = lambda **kwargs: "__".join(kwargs.values())
+
+    def get_categories(self, *group_names):
+        return {group_name: self.categories[group_name] for group_name in group_names}
+
+    def get_names(self):
+        return {cat.name for cat, _, _ in self.config.walk_categories()}
+
+    def get_parent_names(self, cat_name):
+        return {cat.name for cat in self.config.get_category(cat_name).parent_categories}
+
+    def test_names(self):
+        n = create_category_combinations(
+            self.config,
+            self.get_categories("lep", "jet", "tag"),
+            self.name_fn,
+        )
+
+        self.assertEqual(n, 12)
+        self.assertEqual(self.get_names(), {
+            "e", "mu", "1j", "2j", "0b", "sr",
+            "e__1j", "e__2j", "mu__1j", "mu__2j", "e__0b", "mu__0b", "1j__0b", "2j__0b",
+            "e__1j__0b", "e__2j__0b", "mu__1j__0b", "mu__2j__0b",
+        })
+
+    def test_name_fn_kwargs_order(self):
+        group_names = ["lep", "jet", "tag", "reg"]
+        calls = []
+
+        def name_fn(**kwargs):
+            calls.append(tuple(kwargs))
+            return self.name_fn(**kwargs)
+
+        create_category_combinations(self.config, self.get_categories(*group_names), name_fn)
+
+        # keyword arguments must always be passed in group order
+        self.assertTrue(calls)
+        for call in calls:
+            self.assertEqual(list(call), [g for g in group_names if g in call])
+
+    def test_str_subclass_names(self):
+        class Name(str):
+            pass
+
+        categories = {Name(group_name): cats for group_name, cats in self.get_categories("lep", "jet").items()}
+        n = create_category_combinations(self.config, categories, lambda **kwargs: Name(self.name_fn(**kwargs)))
+
+        self.assertEqual(n, 4)
+        self.assertEqual(self.get_parent_names("mu__2j"), {"mu", "2j"})
+
+    def test_parents(self):
+        create_category_combinations(
+            self.config,
+            self.get_categories("lep", "jet", "tag", "reg"),
+            self.name_fn,
+        )
+
+        # depth 2
+        self.assertEqual(self.get_parent_names("e__1j"), {"e", "1j"})
+        self.assertEqual(self.get_parent_names("0b__sr"), {"0b", "sr"})
+
+        # depth 3
+        self.assertEqual(self.get_parent_names("mu__2j__0b"), {"mu__2j", "mu__0b", "2j__0b"})
+
+        # depth 4
+        self.assertEqual(
+            self.get_parent_names("e__1j__0b__sr"),
+            {"e__1j__0b", "e__1j__sr", "e__0b__sr", "1j__0b__sr"},
+        )
+        self.assertEqual(
+            {cat.name for cat in self.config.get_category("1j__0b__sr").categories},
+            {"e__1j__0b__sr", "mu__1j__0b__sr"},
+        )
+
+    def test_ids_and_selections(self):
+        create_category_combinations(
+            self.config,
+            self.get_categories("lep", "jet", "tag"),
+            self.name_fn,
+        )
+
+        cat = self.config.get_category("e__1j")
+        self.assertEqual(cat.id, 1224313071)
+        self.assertEqual(cat.selection, ["sel_e", "sel_1j"])
+
+        cat = self.config.get_category("mu__2j__0b")
+        self.assertEqual(cat.id, create_category_id(self.config, "mu__2j__0b"))
+        self.assertEqual(cat.selection, ["sel_mu", "sel_2j", "sel_0b"])
+
+    def test_kwargs_fn(self):
+        ids = {"e__1j": 101, "e__2j": 102, "mu__1j": 103, "mu__2j": 104}
+
+        def kwargs_fn(categories):
+            self.assertEqual(list(categories), ["lep", "jet"])
+            names = [cat.name for cat in categories.values()]
+            return {"id": ids["__".join(names)], "selection": "&&".join(names)}
+
+        create_category_combinations(
+            self.config,
+            self.get_categories("lep", "jet"),
+            self.name_fn,
+            kwargs_fn,
+        )
+
+        cat = self.config.get_category("mu__2j")
+        self.assertEqual(cat.selection, "mu&&2j")
+        self.assertEqual(cat.id, 104)
+
+    def test_skip_existing(self):
+        n = create_category_combinations(self.config, self.get_categories("lep", "jet"), self.name_fn)
+        self.assertEqual(n, 4)
+        cat = self.config.get_category("e__1j")
+
+        # incremental call, only creating the missing combinations
+        n = create_category_combinations(
+            self.config,
+            self.get_categories("lep", "jet", "tag"),
+            self.name_fn,
+        )
+        self.assertEqual(n, 8)
+
+        # existing categories are kept and connected to new children
+        self.assertIs(self.config.get_category("e__1j"), cat)
+        self.assertEqual({c.name for c in cat.categories}, {"e__1j__0b"})
+        self.assertEqual(self.get_parent_names("e__1j__0b"), {"e__1j", "e__0b", "1j__0b"})
+
+        # a third call creates nothing
+        n = create_category_combinations(
+            self.config,
+            self.get_categories("lep", "jet", "tag"),
+            self.name_fn,
+        )
+        self.assertEqual(n, 0)
+
+    def test_max_combinations(self):
+        categories = self.get_categories("lep", "jet", "tag")
+
+        with self.assertLogs("columnflow.config_util", level="WARNING") as cm:
+            create_category_combinations(self.config, categories, self.name_fn, max_combinations=11)
+        self.assertEqual(len(cm.output), 1)
+        self.assertIn("creating 12 category combinations", cm.output[0])
+
+        # no warning when the limit is not exceeded or the check is disabled
+        with self.assertNoLogs("columnflow.config_util", level="WARNING"):
+            create_category_combinations(self.config, categories, self.name_fn, max_combinations=12)
+            create_category_combinations(self.config, categories, self.name_fn, max_combinations=None)